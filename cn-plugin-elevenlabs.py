@@ -2,8 +2,13 @@
 Provides ElevenLabs Text-to-Speech and Speech-to-Text capabilities.
 """
 
-from typing import override, Iterable, Any
+from typing import override, Callable, Iterable, Iterator, Any
+import array
+import functools
 import io
+import queue
+import struct
+import threading
 import speech_recognition as sr
 
 from lib.PluginHelper import PluginHelper, TTSModel, STTModel
@@ -19,6 +24,251 @@ from lib.PluginBase import PluginBase, PluginManifest
 from lib.Logger import log
 
 
+@functools.lru_cache(maxsize=1)
+def _import_elevenlabs() -> Any:
+    """Import the ElevenLabs client class once and memoize it."""
+    try:
+        from elevenlabs.client import ElevenLabs
+    except ImportError:
+        raise ImportError("elevenlabs is not installed. Install it with: pip install elevenlabs")
+    return ElevenLabs
+
+
+# Audio format used for STT uploads: 16kHz 16-bit mono PCM
+_STT_SAMPLE_RATE = 16000
+_STT_SAMPLE_WIDTH = 2
+# Cleared after the first failed FLAC encoding, later uploads go straight to WAV
+_flac_available = True
+
+
+def _wav_header(data_size: int, sample_rate: int, sample_width: int, channels: int = 1) -> bytes:
+    """Build a 44-byte PCM WAV header for a data chunk of the given size."""
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate,
+        sample_rate * channels * sample_width, channels * sample_width, sample_width * 8,
+        b'data', data_size,
+    )
+
+
+def _encode_stt_audio(audio: sr.AudioData) -> io.BytesIO:
+    """
+    Encode audio for upload to the speech-to-text API.
+    
+    FLAC is used to shrink the upload, with a fallback to WAV when no FLAC encoder is available.
+    """
+    global _flac_available
+    if _flac_available:
+        try:
+            flac_data = audio.get_flac_data(convert_rate=_STT_SAMPLE_RATE, convert_width=_STT_SAMPLE_WIDTH)
+            # get_flac_data ignores the encoder's exit code and returns no data when it fails
+            if not flac_data:
+                raise OSError("FLAC encoder produced no output")
+        except OSError as e:
+            _flac_available = False
+            log('debug', f"FLAC encoding unavailable, uploading WAV instead: {e}")
+        else:
+            audio_file = io.BytesIO(flac_data)
+            audio_file.name = "audio.flac"
+            return audio_file
+    
+    # The header is written in front of the raw PCM to avoid copying the whole clip again
+    raw_data = audio.get_raw_data(convert_rate=_STT_SAMPLE_RATE, convert_width=_STT_SAMPLE_WIDTH)
+    audio_file = io.BytesIO()
+    audio_file.write(_wav_header(len(raw_data), _STT_SAMPLE_RATE, _STT_SAMPLE_WIDTH))
+    audio_file.write(raw_data)
+    audio_file.seek(0)
+    audio_file.name = "audio.wav"
+    return audio_file
+
+
+def _clean_transcript(text: str | None) -> str:
+    """Strip surrounding whitespace from a transcript, skipping the scan when there is none."""
+    if not text:
+        return ""
+    if text[0].isspace() or text[-1].isspace():
+        return text.strip()
+    return text
+
+
+# Number of TTS chunks buffered ahead of the consumer (~200ms of 24kHz PCM)
+_TTS_PREFETCH_CHUNKS = 8
+_STREAM_END = object()
+
+
+def _prefetch(chunks: Iterable[bytes], maxsize: int) -> Iterator[bytes]:
+    """
+    Drain an iterable on a background thread and yield its items through a bounded queue.
+    
+    This overlaps network reads with the consumer's processing. Exceptions raised by the
+    producer are re-raised in the consumer once the already queued items have been yielded.
+    """
+    buffer: queue.Queue[Any] = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    errors: list[Exception] = []
+    
+    def put(item: Any) -> bool:
+        # Poll so the producer notices when the consumer has gone away
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def producer() -> None:
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        put(_STREAM_END)
+    
+    threading.Thread(target=producer, name='elevenlabs-prefetch', daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _STREAM_END:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+
+
+# TTS audio is yielded in 20ms frames of 24kHz 16-bit mono PCM
+_TTS_FRAME_BYTES = 24000 * 2 * 20 // 1000
+
+
+def _coalesce_frames(chunks: Iterable[bytes], frame_size: int) -> Iterator[bytes]:
+    """Regroup a stream of arbitrarily sized chunks into fixed-size frames, followed by any remainder."""
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        if len(buf) < frame_size:
+            continue
+        end = len(buf) - len(buf) % frame_size
+        for start in range(0, end, frame_size):
+            yield bytes(buf[start:start + frame_size])
+        del buf[:end]
+    if buf:
+        yield bytes(buf)
+
+
+# Supported TTS output formats, all audio is played back as 24kHz 16-bit mono PCM
+_TTS_OUTPUT_FORMATS = ('pcm_24000', 'pcm_16000')
+
+
+class _PcmUpsampler:
+    """Streaming 16kHz to 24kHz resampler for 16-bit mono PCM using linear interpolation."""
+    
+    def __init__(self):
+        self._pending = b''
+    
+    def feed(self, chunk: bytes) -> bytes:
+        """Resample a chunk, holding back samples needed to interpolate the next one."""
+        data = self._pending + chunk
+        # Every 2 input samples become 3 output samples, the third needs the next input sample
+        usable = (len(data) // 2 - 1) // 2 * 2
+        if usable <= 0:
+            self._pending = data
+            return b''
+        samples = array.array('h', data[:(usable + 1) * 2])
+        self._pending = data[usable * 2:]
+        
+        x0 = samples[0:usable:2]
+        x1 = samples[1:usable:2]
+        x2 = samples[2:usable + 1:2]
+        out = array.array('h', bytes(len(x0) * 6))
+        out[0::3] = x0
+        out[1::3] = array.array('h', [(a + 2 * b) // 3 for a, b in zip(x0, x1)])
+        out[2::3] = array.array('h', [(2 * b + c) // 3 for b, c in zip(x1, x2)])
+        return out.tobytes()
+    
+    def flush(self) -> bytes:
+        """Return the remaining samples, holding the last value in place of the missing lookahead."""
+        data = self._pending[:len(self._pending) // 2 * 2]
+        self._pending = b''
+        if len(data) < 4:
+            return data
+        # Repeating the last sample yields exactly the one missing interpolated sample
+        out = self.feed(data + data[-2:])
+        self._pending = b''
+        return out
+
+
+def _upsample(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Resample a stream of 16kHz PCM chunks to 24kHz."""
+    upsampler = _PcmUpsampler()
+    for chunk in chunks:
+        yield upsampler.feed(chunk)
+    yield upsampler.flush()
+
+
+# ElevenLabs clients shared across model instances, keyed by API key, with their httpx client
+_CLIENT_CACHE: dict[str, tuple[Any, Any]] = {}
+
+
+def _create_http_client() -> Any:
+    """Create a pooled httpx client that keeps connections alive between TTS/STT calls."""
+    import httpx
+    
+    # HTTP/2 support comes from the h2 package listed in requirements.txt
+    transport = httpx.HTTPTransport(
+        http2=True,
+        retries=1,
+        limits=httpx.Limits(max_keepalive_connections=8, max_connections=16, keepalive_expiry=300.0),
+    )
+    # Match the redirect handling of the client the SDK would otherwise build itself
+    return httpx.Client(transport=transport, follow_redirects=True)
+
+
+def _warm_up(client: Any) -> None:
+    """Open a connection to the API in the background so the first real request skips the handshakes."""
+    def run() -> None:
+        try:
+            client.models.list()
+        except Exception as e:
+            log('debug', f"ElevenLabs connection warm-up failed: {e}")
+    
+    threading.Thread(target=run, name='elevenlabs-warmup', daemon=True).start()
+
+
+def _get_shared_client(api_key: str) -> Any:
+    """Return the ElevenLabs client for the given API key, creating and warming it up on first use."""
+    cached = _CLIENT_CACHE.get(api_key)
+    if cached is None:
+        ElevenLabs = _import_elevenlabs()
+        http_client = _create_http_client()
+        try:
+            new_client = ElevenLabs(api_key=api_key, httpx_client=http_client)
+        except Exception as e:
+            http_client.close()
+            log('error', f"Failed to initialize ElevenLabs client: {e}")
+            raise
+        cached = _CLIENT_CACHE.setdefault(api_key, (new_client, http_client))
+        if cached[0] is new_client:
+            _warm_up(new_client)
+        else:
+            http_client.close()
+    return cached[0]
+
+
+def _release_shared_client(api_key: str) -> None:
+    """Drop the shared client for an API key that is no longer used and close its connection pool."""
+    cached = _CLIENT_CACHE.pop(api_key, None)
+    if cached is not None:
+        cached[1].close()
+
+
 class ElevenLabsSTTModel(STTModel):
     """ElevenLabs Speech-to-Text model implementation using Scribe."""
     
@@ -32,32 +282,18 @@ class ElevenLabsSTTModel(STTModel):
         self.api_key = api_key
         self.model_id = model_id
         self.language_code = language_code
-        self._client: Any = None
     
-    def _get_client(self) -> Any:
+    @functools.cached_property
+    def client(self) -> Any:
         """Lazily initialize the ElevenLabs client."""
-        if self._client is None:
-            try:
-                from elevenlabs.client import ElevenLabs
-                
-                self._client = ElevenLabs(api_key=self.api_key)
-            except ImportError:
-                raise ImportError("elevenlabs is not installed. Install it with: pip install elevenlabs")
-            except Exception as e:
-                log('error', f"Failed to initialize ElevenLabs client: {e}")
-                raise
-        return self._client
+        return _get_shared_client(self.api_key)
     
     def transcribe(self, audio: sr.AudioData) -> str:
         """Transcribe audio using ElevenLabs Scribe speech-to-text."""
-        client = self._get_client()
+        client = self.client
         
         try:
-            # Convert audio to WAV format for the API
-            # ElevenLabs accepts various formats including WAV
-            wav_data = audio.get_wav_data(convert_rate=16000, convert_width=2)
-            audio_file = io.BytesIO(wav_data)
-            audio_file.name = "audio.wav"
+            audio_file = _encode_stt_audio(audio)
             
             # Call the speech-to-text API
             kwargs: dict[str, Any] = {
@@ -70,7 +306,7 @@ class ElevenLabsSTTModel(STTModel):
             
             result = client.speech_to_text.convert(**kwargs)
             
-            return result.text.strip() if result.text else ""
+            return _clean_transcript(result.text)
             
         except Exception as e:
             log('error', f"ElevenLabs STT transcription failed: {e}")
@@ -88,6 +324,7 @@ class ElevenLabsTTSModel(TTSModel):
         similarity_boost: float = 0.75,
         style: float = 0.0,
         use_speaker_boost: bool = True,
+        output_format: str = "pcm_24000",
     ):
         super().__init__("elevenlabs-tts")
         self.api_key = api_key
@@ -96,50 +333,47 @@ class ElevenLabsTTSModel(TTSModel):
         self.similarity_boost = similarity_boost
         self.style = style
         self.use_speaker_boost = use_speaker_boost
-        self._client: Any = None
+        self.output_format = output_format
+        # Voice settings are fixed per model, so build the request payload once
+        self._voice_settings = {
+            "stability": stability,
+            "similarity_boost": similarity_boost,
+            "style": style,
+            "use_speaker_boost": use_speaker_boost,
+        }
     
-    def _get_client(self) -> Any:
+    @functools.cached_property
+    def client(self) -> Any:
         """Lazily initialize the ElevenLabs client."""
-        if self._client is None:
-            try:
-                from elevenlabs.client import ElevenLabs
-                
-                self._client = ElevenLabs(api_key=self.api_key)
-            except ImportError:
-                raise ImportError("elevenlabs is not installed. Install it with: pip install elevenlabs")
-            except Exception as e:
-                log('error', f"Failed to initialize ElevenLabs client: {e}")
-                raise
-        return self._client
+        return _get_shared_client(self.api_key)
     
     def synthesize(self, text: str, voice: str) -> Iterable[bytes]:
         """
         Synthesize speech using ElevenLabs Text-to-Speech with low-latency streaming.
         
         Returns PCM audio at 24kHz 16-bit for optimal playback compatibility.
+        pcm_16000 output is requested at the lower rate to save bandwidth and upsampled locally.
         """
-        client = self._get_client()
+        client = self.client
         
         try:
-            # Use streaming TTS with PCM 24kHz output for low latency
-            # The pcm_24000 format outputs 16-bit signed little-endian PCM at 24kHz
+            # Use streaming PCM output for low latency
+            # The pcm_* formats output 16-bit signed little-endian PCM at the given sample rate
             audio_stream = client.text_to_speech.stream(
                 text=text,
                 voice_id=voice,
                 model_id=self.model_id,
-                output_format="pcm_24000",  # 24kHz 16-bit PCM for low latency
-                voice_settings={
-                    "stability": self.stability,
-                    "similarity_boost": self.similarity_boost,
-                    "style": self.style,
-                    "use_speaker_boost": self.use_speaker_boost,
-                },
+                output_format=self.output_format,
+                voice_settings=self._voice_settings,
             )
             
             # Yield audio chunks as they arrive for real-time playback
-            for chunk in audio_stream:
-                if isinstance(chunk, bytes) and chunk:
-                    yield chunk
+            # Read ahead on a background thread so network I/O overlaps with playback,
+            # and regroup the network-sized chunks into even frames for the audio sink
+            chunks = _prefetch(audio_stream, _TTS_PREFETCH_CHUNKS)
+            if self.output_format == 'pcm_16000':
+                chunks = _upsample(chunks)
+            yield from _coalesce_frames(chunks, _TTS_FRAME_BYTES)
                     
         except Exception as e:
             log('error', f"ElevenLabs TTS synthesis failed: {e}")
@@ -155,8 +389,17 @@ class ElevenLabsPlugin(PluginBase):
     def __init__(self, plugin_manifest: PluginManifest):
         super().__init__(plugin_manifest)
         
+        # Current model per provider id, along with the settings key it was created from
+        self._model_cache: dict[str, tuple[tuple[Any, ...], ElevenLabsSTTModel | ElevenLabsTTSModel]] = {}
         
-        self.settings_config = PluginSettings(
+        # Settings are built lazily on first access, drop any defaults set by PluginBase
+        self.__dict__.pop('settings_config', None)
+        self.__dict__.pop('model_providers', None)
+    
+    @functools.cached_property
+    def settings_config(self) -> PluginSettings:
+        """Plugin settings, built on first access."""
+        return PluginSettings(
             key="ElevenLabs",
             label="ElevenLabs",
             icon="mic",
@@ -196,9 +439,11 @@ class ElevenLabsPlugin(PluginBase):
                 ),
             ]
         )
-        
-        # Define model providers for STT and TTS
-        self.model_providers: list[ModelProviderDefinition] | None = [
+    
+    @functools.cached_property
+    def model_providers(self) -> list[ModelProviderDefinition] | None:
+        """Model providers for STT and TTS, built on first access."""
+        return [
             ModelProviderDefinition(
                 kind='stt',
                 id='elevenlabs-stt',
@@ -332,46 +577,106 @@ class ElevenLabsPlugin(PluginBase):
                                 max_value=1.0,
                                 step=0.05,
                             ),
+                            TextSetting(
+                                key='elevenlabs_output_format',
+                                label='Output Format (pcm_24000 or pcm_16000)',
+                                type='text',
+                                readonly=False,
+                                placeholder='pcm_24000',
+                                default_value='pcm_24000',
+                                max_length=None,
+                                min_length=None,
+                                hidden=False,
+                            ),
                         ]
                     ),
                 ],
             ),
         ]
     
+    def _replace_model(
+        self,
+        provider_id: str,
+        key: tuple[Any, ...],
+        model: ElevenLabsSTTModel | ElevenLabsTTSModel,
+    ) -> None:
+        """Make the model current for its provider, releasing the client of a no longer used API key."""
+        previous = self._model_cache.get(provider_id)
+        self._model_cache[provider_id] = (key, model)
+        
+        if previous is not None:
+            previous_api_key = previous[1].api_key
+            if all(cached.api_key != previous_api_key for _, cached in self._model_cache.values()):
+                _release_shared_client(previous_api_key)
+        
+        # Create the client now so its connection is warm before the first request
+        _get_shared_client(model.api_key)
+    
+    def _build_stt(self, settings: dict[str, Any]) -> STTModel:
+        """Create or reuse the STT model for the given settings."""
+        api_key = settings.get('elevenlabs_api_key', '')
+        if not api_key:
+            raise ValueError('ElevenLabs STT: No API key provided')
+        
+        model_id = settings.get('elevenlabs_stt_model_id', 'scribe_v1')
+        language_code = settings.get('elevenlabs_stt_language', '') or None
+        
+        key = (api_key, model_id, language_code)
+        cached = self._model_cache.get('elevenlabs-stt')
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        model = ElevenLabsSTTModel(
+            api_key=api_key,
+            model_id=model_id,
+            language_code=language_code,
+        )
+        self._replace_model('elevenlabs-stt', key, model)
+        return model
+    
+    def _build_tts(self, settings: dict[str, Any]) -> TTSModel:
+        """Create or reuse the TTS model for the given settings."""
+        api_key = settings.get('elevenlabs_api_key', '')
+        if not api_key:
+            raise ValueError('ElevenLabs TTS: No API key provided')
+        
+        model_id = settings.get('elevenlabs_model_id', 'eleven_flash_v2_5')
+        stability = float(settings.get('elevenlabs_stability', 0.5))
+        similarity_boost = float(settings.get('elevenlabs_similarity_boost', 0.75))
+        style = float(settings.get('elevenlabs_style', 0.0))
+        # Free-text setting, tolerate stray whitespace and capitalization
+        output_format = str(settings.get('elevenlabs_output_format') or '').strip().lower() or 'pcm_24000'
+        if output_format not in _TTS_OUTPUT_FORMATS:
+            raise ValueError(f'ElevenLabs TTS: Unsupported output format {output_format}, use one of {", ".join(_TTS_OUTPUT_FORMATS)}')
+        
+        key = (api_key, model_id, stability, similarity_boost, style, output_format)
+        cached = self._model_cache.get('elevenlabs-tts')
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        model = ElevenLabsTTSModel(
+            api_key=api_key,
+            model_id=model_id,
+            stability=stability,
+            similarity_boost=similarity_boost,
+            style=style,
+            output_format=output_format,
+        )
+        self._replace_model('elevenlabs-tts', key, model)
+        return model
+    
+    # Model builders by provider id
+    _BUILDERS: dict[str, Callable[['ElevenLabsPlugin', dict[str, Any]], TTSModel | STTModel]] = {
+        'elevenlabs-stt': _build_stt,
+        'elevenlabs-tts': _build_tts,
+    }
+    
     @override
     def create_model(self, provider_id: str, settings: dict[str, Any]) -> TTSModel | STTModel:
         """Create a model instance for the given provider."""
         
-        if provider_id == 'elevenlabs-stt':
-            api_key = settings.get('elevenlabs_api_key', '')
-            if not api_key:
-                raise ValueError('ElevenLabs STT: No API key provided')
-            
-            model_id = settings.get('elevenlabs_stt_model_id', 'scribe_v1')
-            language_code = settings.get('elevenlabs_stt_language', '') or None
-            
-            return ElevenLabsSTTModel(
-                api_key=api_key,
-                model_id=model_id,
-                language_code=language_code,
-            )
-        
-        elif provider_id == 'elevenlabs-tts':
-            api_key = settings.get('elevenlabs_api_key', '')
-            if not api_key:
-                raise ValueError('ElevenLabs TTS: No API key provided')
-            
-            model_id = settings.get('elevenlabs_model_id', 'eleven_flash_v2_5')
-            stability = float(settings.get('elevenlabs_stability', 0.5))
-            similarity_boost = float(settings.get('elevenlabs_similarity_boost', 0.75))
-            style = float(settings.get('elevenlabs_style', 0.0))
-            
-            return ElevenLabsTTSModel(
-                api_key=api_key,
-                model_id=model_id,
-                stability=stability,
-                similarity_boost=similarity_boost,
-                style=style,
-            )
+        builder = self._BUILDERS.get(provider_id)
+        if builder is None:
+            raise ValueError(f'Unknown ElevenLabs provider: {provider_id}')
         
-        raise ValueError(f'Unknown ElevenLabs provider: {provider_id}')
\ No newline at end of file
+        return builder(self, settings)
\ No newline at end of file